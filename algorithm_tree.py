@@ -18,23 +18,25 @@
 import copy
 import re
 
+import numpy as np
+
 
 class Node:
-    def __init__(self, info=[]):
+    __slots__ = ("parent", "level", "children", "info")
+
+    def __init__(self, info=None):
         self.parent = None
         self.level = 0
         self.children = []
-        self.info = info
+        self.info = [] if info is None else info
 
     def to_list(self):
         res = []
-
-        def to_list_int(node, lst):
-            lst.append(node)
-            for nd in node.children:
-                to_list_int(nd, lst)
-
-        to_list_int(self, res)
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            res.append(node)
+            stack.extend(reversed(node.children))
         return res
 
     def append(self, tree):
@@ -43,61 +45,41 @@ class Node:
         self.children.append(tree)
 
     def find_all(self, cond):
-        def find_all_int(node, cond, res):
-            if cond(node.info):
-                res.append(node)
-            for nd in node.children:
-                find_all_int(nd, cond, res)
-
-        result = []
-        find_all_int(self, cond, result)
-        return result
+        return [nd for nd in self.to_list() if cond(nd.info)]
 
+    # Last node in depth-first order for which the condition holds, as well as
+    # for all its ancestors
     def find_in_depth(self, cond):
-        def find_in_depth_int(node, cond, res):
+        result = None
+        stack = [self]
+        while stack:
+            node = stack.pop()
             if cond(node.info):
-                res[0] = node
-                for nd in node.children:
-                    find_in_depth_int(nd, cond, res)
-
-        result = [None]
-        find_in_depth_int(self, cond, result)
-        return result[0]
+                result = node
+                stack.extend(reversed(node.children))
+        return result
 
     def find_first(self, cond):
-        def find_first_int(node, cond, res):
-            if res:
-                return
-            else:
-                if cond(node.info):
-                    res.append(node)
-                    return
-                for nd in node.children:
-                    find_first_int(nd, cond, res)
-
-        result = []
-        find_first_int(self, cond, result)
-        return result[0]
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if cond(node.info):
+                return node
+            stack.extend(reversed(node.children))
+        raise IndexError("No node satisfies the condition.")
 
+    # The info lists only hold strings and numbers, so a shallow copy is enough
     def clone(self):
-        def clone_int(nd_new, nd_old):
-            for ch in nd_old.children:
-                nd_new.append(Node(copy.deepcopy(ch.info)))
-            for i in range(len(nd_old.children)):
-                clone_int(nd_new.children[i], nd_old.children[i])
-
-        root = Node(copy.deepcopy(self.info))
-        clone_int(root, self)
-        return root
+        return self.apply(lambda info: info)
 
     def apply(self, func):
-        def apply_int(nd, func):
-            nd.info = func(nd.info)
-            for ch in nd.children:
-                apply_int(ch, func)
-
-        root = self.clone()
-        apply_int(root, func)
+        root = Node(func(copy.copy(self.info)))
+        stack = [(root, self)]
+        while stack:
+            nd_new, nd_old = stack.pop()
+            for ch in nd_old.children:
+                nd_new.append(Node(func(copy.copy(ch.info))))
+            stack.extend(zip(nd_new.children, nd_old.children))
         return root
 
     def apply_pairwise(self, other, check, func):
@@ -111,16 +93,173 @@ class Node:
         return root
 
     def apply_from_head_childs(self, func):
-        def apply_from_head_childs_int(nd, func):
-            nd.info = func(nd.info, [ch.info for ch in nd.children])
-            for ch in nd.children:
-                apply_from_head_childs_int(ch, func)
-
         root = self.clone()
-        apply_from_head_childs_int(root, func)
+        for nd in root.to_list():
+            nd.info = func(nd.info, [ch.info for ch in nd.children])
         return root
 
 
+# Compact representation of a list of trees, stored as parallel arrays in
+# depth-first order, so that the subtree of node i is the range
+# [i, i + size[i]). Algorithm names are stored once in the names list.
+class Forest:
+    columns = ("start", "finish", "name_id", "counter", "thread_id")
+
+    def __init__(self, parent, level, size, start, finish, name_id, counter, thread_id, names):
+        self.parent = parent
+        self.level = level
+        self.size = size
+        self.start = start
+        self.finish = finish
+        self.name_id = name_id
+        self.counter = counter
+        self.thread_id = thread_id
+        self.names = names
+        # Python lists of the structure and of the info of each node, built on
+        # first use by the Node-compatible views, which read them one element
+        # at a time
+        self._structure = None
+        self._infos = None
+
+    def __len__(self):
+        return len(self.parent)
+
+    def roots(self):
+        return np.flatnonzero(self.parent < 0)
+
+    # Lists of the parent, level and size of each node
+    def structure(self):
+        if self._structure is None:
+            self._structure = (self.parent.tolist(), self.level.tolist(), self.size.tolist())
+        return self._structure
+
+    def children(self, i):
+        size = self.structure()[2]
+        res = []
+        j = i + 1
+        while j < i + size[i]:
+            res.append(j)
+            j += size[j]
+        return res
+
+    def info(self, i):
+        if self._infos is None:
+            names = self.names
+            self._infos = [
+                [names[name] + " " + str(counter), start, finish, counter, tid]
+                for name, counter, start, finish, tid in zip(
+                    self.name_id.tolist(),
+                    self.counter.tolist(),
+                    self.start.tolist(),
+                    self.finish.tolist(),
+                    self.thread_id.tolist(),
+                )
+            ]
+        return self._infos[i]
+
+    # Part of each call not covered by any of its children. Children running
+    # on different threads can overlap, so the union of their intervals is
+    # subtracted, merging them in start order.
+    def self_time(self):
+        parent = self.parent.tolist()
+        start = self.start.tolist()
+        finish = self.finish.tolist()
+        covered = [0] * len(parent)
+        # End of the children merged so far
+        end = list(start)
+        # Nodes are stored in depth-first order, so the children of a node
+        # come in start order
+        for i, p in enumerate(parent):
+            if p >= 0 and finish[i] > end[p]:
+                covered[p] += finish[i] - max(start[i], end[p])
+                end[p] = finish[i]
+        return self.finish - self.start - np.array(covered, dtype=np.int64)
+
+    def node(self, i):
+        return NodeView(self, i)
+
+    def trees(self):
+        return [NodeView(self, i) for i in self.roots()]
+
+    # Vectorized equivalent of Node.apply: func receives a dict of the data
+    # columns and returns a dict of the columns to replace. The tree structure
+    # is shared with the new forest.
+    def apply(self, func):
+        data = {key: getattr(self, key) for key in self.columns}
+        data.update(func(dict(data)))
+        return Forest(self.parent, self.level, self.size, names=self.names, **data)
+
+
+# Read-only view on a node of a Forest, with the same interface as Node
+class NodeView:
+    __slots__ = ("forest", "index")
+
+    def __init__(self, forest, index):
+        self.forest = forest
+        self.index = int(index)
+
+    @property
+    def parent(self):
+        p = self.forest.structure()[0][self.index]
+        return None if p < 0 else NodeView(self.forest, p)
+
+    @property
+    def level(self):
+        return self.forest.structure()[1][self.index]
+
+    @property
+    def children(self):
+        return [NodeView(self.forest, j) for j in self.forest.children(self.index)]
+
+    @property
+    def info(self):
+        return self.forest.info(self.index)
+
+    def to_list(self):
+        end = self.index + self.forest.structure()[2][self.index]
+        return [NodeView(self.forest, j) for j in range(self.index, end)]
+
+    def find_all(self, cond):
+        return [nd for nd in self.to_list() if cond(nd.info)]
+
+    def find_in_depth(self, cond):
+        forest = self.forest
+        result = None
+        stack = [self.index]
+        while stack:
+            i = stack.pop()
+            if cond(forest.info(i)):
+                result = i
+                stack.extend(reversed(forest.children(i)))
+        return None if result is None else NodeView(forest, result)
+
+    def find_first(self, cond):
+        for nd in self.to_list():
+            if cond(nd.info):
+                return nd
+        raise IndexError("No node satisfies the condition.")
+
+    def clone(self):
+        return self.apply(lambda info: info)
+
+    def apply(self, func):
+        forest = self.forest
+        parent, _, size = forest.structure()
+        nodes = {}
+        for i in range(self.index, self.index + size[self.index]):
+            # The info lists are shared by all the views of the forest
+            nodes[i] = Node(func(copy.copy(forest.info(i))))
+            if i != self.index:
+                nodes[parent[i]].append(nodes[i])
+        return nodes[self.index]
+
+    def apply_pairwise(self, other, check, func):
+        return self.clone().apply_pairwise(other, check, func)
+
+    def apply_from_head_childs(self, func):
+        return self.clone().apply_from_head_childs(func)
+
+
 def apply_multiple_trees(trees, check, func):
     root = trees[0].clone()
     lst = root.to_list()
@@ -177,31 +316,106 @@ def cmp_to_key(mycmp):
     return K
 
 
-def toTrees(records):
-    recs = sorted(
-        records,
-        key=cmp_to_key(lambda x, y: x["start"] - y["start"] if x["start"] != y["start"] else y["finish"] - x["finish"]),
-    )
-
-    def rec_to_node(r, counter):
-        return Node([r["name"] + " " + str(counter), r["start"], r["finish"], counter])
-
-    heads = []
-    counter = dict()
-    for rec in recs:
+# Build the forest of algorithm calls. Each record becomes a child of the
+# deepest (and latest) call that contains it, inside the first top-level call
+# that contains it.
+def toForest(records):
+    recs = sorted(records, key=lambda x: (x["start"], -x["finish"]))
+    n = len(recs)
+    finish = [r["finish"] for r in recs]
+
+    names = []
+    name_ids = {}
+    name_id = [0] * n
+    counter = [0] * n
+    counts = []
+    parent = [-1] * n
+    children = [[] for _ in range(n)]
+    # Calls which may still contain the next records, i.e. which have not
+    # finished before the current record starts
+    open_heads = []
+    open_children = [[] for _ in range(n)]
+
+    for i, rec in enumerate(recs):
+        name = rec["name"]
+        nid = name_ids.get(name)
+        if nid is None:
+            nid = name_ids[name] = len(names)
+            names.append(name)
+            counts.append(0)
+        name_id[i] = nid
+        counts[nid] += 1
+        counter[i] = counts[nid]
+
+        s = rec["start"]
+        f = finish[i]
+        open_heads = [hd for hd in open_heads if finish[hd] >= s]
         head = None
-        for hd in heads:
-            if rec["start"] >= hd.info[1] and rec["finish"] <= hd.info[2]:
+        for hd in open_heads:
+            if f <= finish[hd]:
                 head = hd
                 break
-        if rec["name"] in counter.keys():
-            counter[rec["name"]] += 1
-        else:
-            counter[rec["name"]] = 1
         if head is None:
-            heads.append(rec_to_node(rec, counter[rec["name"]]))
-        else:
-            parent = head.find_in_depth(cond=lambda x: x[1] <= rec["start"] and rec["finish"] <= x[2])
-            parent.append(rec_to_node(rec, counter[rec["name"]]))
-        # counter += 1
-    return heads
+            open_heads.append(i)
+            continue
+
+        # Descend through the latest child containing the record. Most of the
+        # time this is the last child, so the finished children are only
+        # removed when it is not.
+        node = head
+        while True:
+            opened = open_children[node]
+            if opened and f <= finish[opened[-1]]:
+                node = opened[-1]
+                continue
+            opened = [ch for ch in opened if finish[ch] >= s]
+            open_children[node] = opened
+            for ch in reversed(opened):
+                if f <= finish[ch]:
+                    node = ch
+                    break
+            else:
+                break
+        parent[i] = node
+        children[node].append(i)
+        open_children[node].append(i)
+
+    # Store the nodes in depth-first order
+    order = []
+    level = [0] * n
+    stack = [i for i in reversed(range(n)) if parent[i] < 0]
+    while stack:
+        i = stack.pop()
+        order.append(i)
+        for ch in children[i]:
+            level[ch] = level[i] + 1
+        stack.extend(reversed(children[i]))
+    size = [1] * n
+    for i in reversed(order):
+        if parent[i] >= 0:
+            size[parent[i]] += size[i]
+
+    order = np.array(order, dtype=np.int64)
+    position = np.empty(n + 1, dtype=np.int64)
+    position[order] = np.arange(n)
+    # Roots keep a parent of -1
+    position[-1] = -1
+
+    def column(values, dtype):
+        return np.array(values, dtype=dtype)[order]
+
+    return Forest(
+        position[column(parent, np.int64)],
+        column(level, np.int32),
+        column(size, np.int64),
+        column([r["start"] for r in recs], np.int64),
+        column(finish, np.int64),
+        column(name_id, np.int32),
+        column(counter, np.int64),
+        column([int(r["thread_id"]) for r in recs], np.int64),
+        names,
+    )
+
+
+def toTrees(records):
+    return toForest(records).trees()
@@ -0,0 +1,129 @@
+# Mantid algorithm profiler
+# Copyright (C) 2018 Neil Vaytet & Igor Gudich, European Spallation Source
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check that toForest nests the algorithm calls in the same way as the
+# original toTrees, on random records and on synthetic logs.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import generate  # noqa: E402
+
+import algorithm_tree as at  # noqa: E402
+
+
+# Original implementation of toTrees, quadratic in the number of calls
+def referenceTrees(records):
+    recs = sorted(
+        records,
+        key=at.cmp_to_key(
+            lambda x, y: x["start"] - y["start"] if x["start"] != y["start"] else y["finish"] - x["finish"]
+        ),
+    )
+
+    def rec_to_node(r, counter):
+        return at.Node([r["name"] + " " + str(counter), r["start"], r["finish"], counter])
+
+    heads = []
+    counter = dict()
+    for rec in recs:
+        head = None
+        for hd in heads:
+            if rec["start"] >= hd.info[1] and rec["finish"] <= hd.info[2]:
+                head = hd
+                break
+        if rec["name"] in counter.keys():
+            counter[rec["name"]] += 1
+        else:
+            counter[rec["name"]] = 1
+        if head is None:
+            heads.append(rec_to_node(rec, counter[rec["name"]]))
+        else:
+            parent = head.find_in_depth(cond=lambda x: x[1] <= rec["start"] and rec["finish"] <= x[2])
+            parent.append(rec_to_node(rec, counter[rec["name"]]))
+    return heads
+
+
+# Info, level, parent and children of each node, in depth-first order
+def signature(trees):
+    res = []
+    for tree in trees:
+        for node in tree.to_list():
+            parent = None if node.parent is None else node.parent.info[0]
+            res.append((tuple(node.info[:4]), node.level, parent, tuple(ch.info[0] for ch in node.children)))
+    return res
+
+
+# Random records, with many identical start and end times, and calls of
+# zero length
+def randomRecords(rng, size):
+    records = []
+    for _ in range(size):
+        start = rng.randint(0, 100)
+        records.append(
+            {
+                "thread_id": str(rng.randint(1, 4)),
+                "name": rng.choice("ABCD"),
+                "start": start,
+                "finish": start + rng.randint(0, 40),
+            }
+        )
+    return records
+
+
+# Returns a description of the first input on which the nesting differs, or
+# None if they are all identical
+def check(count=1000, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        records = randomRecords(rng, rng.randint(1, 200))
+        if signature(at.toForest(records).trees()) != signature(referenceTrees(records)):
+            return "random records %i (seed %i)" % (i, seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        infile = os.path.join(workdir, "algotimeregister.out")
+        for depth, fanout, nthreads in [(4, 4, 4), (5, 8, 16)]:
+            generate.writeAlgorithmLog(infile, spans=2000, depth=depth, fanout=fanout, nthreads=nthreads)
+            records = at.fromFile(infile)[1]
+            if signature(at.toForest(records).trees()) != signature(referenceTrees(records)):
+                return "synthetic log (depth %i, fanout %i, threads %i)" % (depth, fanout, nthreads)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare toForest with the original toTrees")
+
+    parser.add_argument("--count", type=int, default=1000, help="number of random inputs")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+
+    args = parser.parse_args()
+
+    failure = check(count=args.count, seed=args.seed)
+    if failure is not None:
+        print("Nesting differs from the original toTrees on " + failure)
+        return 1
+    print("Nesting identical to the original toTrees")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# Mantid algorithm profiler
+# Copyright (C) 2018 Neil Vaytet & Igor Gudich, European Spallation Source
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Generators of synthetic Mantid-like logs for the benchmarks:
+# - algorithm timing logs, as written by Mantid in algotimeregister.out
+# - process monitor logs, as written by psrecord.monitor
+
+import argparse
+import random
+
+ALGORITHMS = [
+    "SNSPowderReduction",
+    "LoadEventNexus",
+    "FilterBadPulses",
+    "AlignAndFocusPowder",
+    "CompressEvents",
+    "ConvertUnits",
+    "Rebin",
+    "DiffractionFocussing",
+    "SumSpectra",
+    "NormaliseByCurrent",
+    "Divide",
+    "Minus",
+    "CropWorkspace",
+    "SaveNexusProcessed",
+]
+
+
+# Write an algorithm timing log with the given number of spans (algorithm
+# calls). Calls are organised in trees of the given depth, where each call
+# has fanout children. The children of top-level calls run concurrently, in
+# groups of nthreads, on different threads. Deeper calls run in sequence on
+# the thread of their parent.
+def writeAlgorithmLog(filename, spans=1000, depth=4, fanout=4, nthreads=4, seed=0):
+    rng = random.Random(seed)
+    ngroups = (fanout + nthreads - 1) // nthreads
+    # The threads of a group start one after the other, each shifted by delta,
+    # and end in the same order, so that their calls overlap without being
+    # nested into each other. A call must not contain any deeper call of an
+    # earlier thread, otherwise the deeper call would be nested into it: each
+    # thread runs its children during the delta before the next thread starts,
+    # and then waits for the group to finish.
+    # Long enough for the shortest calls to last at least 1us.
+    duration = 1000 * ngroups * 2 * nthreads * (2 * fanout) ** (depth - 1)
+    group = duration // ngroups
+    delta = group // (2 * nthreads)
+    count = 0
+    time = 0
+    with open(filename, "w") as outFile:
+        outFile.write("START_POINT: %i MAX_THREAD: %i\n" % (1500000000 * 10**9, nthreads))
+        while count < spans:
+            # Each entry is (thread, level, start, finish, end of the children)
+            stack = [(1, 0, time, time + duration, time + duration)]
+            lines = []
+            while stack and count < spans:
+                thread, level, start, finish, end = stack.pop()
+                lines.append(
+                    "ThreadID=%i, AlgorithmName=%s, StartTime=%i, EndTime=%i\n"
+                    % (thread, rng.choice(ALGORITHMS), start, finish)
+                )
+                count += 1
+                if level + 1 >= depth:
+                    continue
+                children = []
+                if level == 0:
+                    for i in range(fanout):
+                        child_start = start + (i // nthreads) * group + (i % nthreads) * delta + 1
+                        child_end = child_start + delta - 1
+                        children.append((i % nthreads + 1, level + 1, child_start, child_start + group // 2, child_end))
+                else:
+                    slot = (end - start) // fanout
+                    for i in range(fanout):
+                        child_start = start + i * slot + 1
+                        child_finish = child_start + slot * 9 // 10
+                        children.append((thread, level + 1, child_start, child_finish, child_finish))
+                stack.extend(reversed(children))
+            outFile.writelines(lines)
+            time += duration + 1000
+    return count
+
+
+# Write a process monitor log with the given number of samples, each listing
+# the CPU times of nthreads threads
+def writeCpuLog(filename, samples=1000, nthreads=4, interval=0.1, seed=0):
+    rng = random.Random(seed)
+    start_time = 1500000000.0
+    user_times = [0.0] * nthreads
+    with open(filename, "w") as outFile:
+        outFile.write("# Synthetic process monitor log\n")
+        outFile.write("START_TIME: {}\n".format(start_time))
+        for i in range(samples):
+            threads = []
+            for j in range(nthreads):
+                # Threads are not all active at every sample
+                if rng.random() < 0.7:
+                    user_times[j] += interval * rng.random()
+                threads.append("pthread(id=%i, user_time=%.2f, system_time=0.0)" % (1000 + j, user_times[j]))
+            outFile.write(
+                "{0:12.6f} {1:12.3f} {2:12.3f} {3:12.3f} [{4}]\n".format(
+                    start_time + i * interval,
+                    rng.uniform(0.0, 100.0 * nthreads),
+                    rng.uniform(1000.0, 2000.0),
+                    rng.uniform(3000.0, 4000.0),
+                    ", ".join(threads),
+                )
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Mantid profiler input logs")
+
+    parser.add_argument("--infile", type=str, default="algotimeregister.out", help="name of output algorithm log")
+    parser.add_argument("--logfile", type=str, default="mantidprofile.txt", help="name of output monitor log")
+    parser.add_argument("--spans", type=int, default=1000, help="number of algorithm calls")
+    parser.add_argument("--depth", type=int, default=4, help="depth of the algorithm trees")
+    parser.add_argument("--fanout", type=int, default=4, help="number of children of each algorithm")
+    parser.add_argument("--threads", type=int, default=4, help="number of threads")
+    parser.add_argument("--samples", type=int, default=1000, help="number of monitor samples")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+
+    args = parser.parse_args()
+
+    writeAlgorithmLog(
+        args.infile, spans=args.spans, depth=args.depth, fanout=args.fanout, nthreads=args.threads, seed=args.seed
+    )
+    writeCpuLog(args.logfile, samples=args.samples, nthreads=args.threads, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
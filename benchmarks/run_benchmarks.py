@@ -0,0 +1,259 @@
+# Mantid algorithm profiler
+# Copyright (C) 2018 Neil Vaytet & Igor Gudich, European Spallation Source
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Benchmark the stages of the profiler pipeline on synthetic logs, and
+# compare the results against stored baselines.
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import generate  # noqa: E402
+import numpy as np  # noqa: E402
+
+import algorithm_tree as at  # noqa: E402
+import chrome_trace  # noqa: E402
+import flamegraph  # noqa: E402
+import parallelism  # noqa: E402
+
+# The profiler script cannot be imported by name because of the hyphen
+spec = importlib.util.spec_from_file_location(
+    "mantid_profiler", os.path.join(os.path.dirname(HERE), "mantid-profiler.py")
+)
+mantid_profiler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(mantid_profiler)
+
+# Sizes of the synthetic logs
+CASES = {
+    "small": {"spans": 1000, "depth": 4, "fanout": 4, "threads": 4, "samples": 1000},
+    "medium": {"spans": 100000, "depth": 5, "fanout": 8, "threads": 16, "samples": 10000},
+    "large": {"spans": 1000000, "depth": 6, "fanout": 8, "threads": 64, "samples": 100000},
+}
+
+STAGES = ["fromFile", "toTrees", "parse_cpu_log", "analysis", "foldStacks", "htmlProfile", "writeTrace"]
+
+
+# Run the stages of the pipeline on the logs, in the same way as the profiler
+# does. Returns the state shared by the stages, and for each stage, a function
+# running it.
+def pipeline(infile, logfile, workdir):
+    state = {}
+
+    def fromFile():
+        state["header"], state["records"] = at.fromFile(infile)
+
+    def toTrees():
+        state["forest"] = at.toForest(state["records"])
+
+    def parseCpuLog():
+        state["sync_time"], state["data"] = mantid_profiler.parse_cpu_log(logfile)
+
+    def analysis():
+        state["parallel"] = parallelism.analyse(state["forest"])
+
+    def foldStacks():
+        state["stacks"] = flamegraph.foldStacks(state["forest"])
+
+    def htmlProfile():
+        mantid_profiler.htmlProfile(
+            filename=os.path.join(workdir, "profile.html"),
+            x=state["data"][:, 0] - state["sync_time"],
+            data=state["data"],
+            forest=state["forest"],
+            fill_factor=0,
+            nthreads=int(state["header"].split()[3]),
+            lmax=int(state["forest"].level.max()),
+            sync_time=state["sync_time"],
+            header=int(state["header"].split()[1]),
+            parallel=state["parallel"],
+            stacks=state["stacks"],
+        )
+
+    def writeTrace():
+        chrome_trace.writeTrace(
+            filename=os.path.join(workdir, "trace.json.gz"),
+            x=state["data"][:, 0] - state["sync_time"],
+            data=state["data"],
+            forest=state["forest"],
+            sync_time=state["sync_time"],
+            header=int(state["header"].split()[1]),
+        )
+
+    return state, dict(zip(STAGES, [fromFile, toTrees, parseCpuLog, analysis, foldStacks, htmlProfile, writeTrace]))
+
+
+# Check that the forest built from a synthetic log has the shape requested
+# from the generator: the depth of the trees, the number of children of each
+# call, and deeper calls running on the thread of their parent. The last tree
+# may be incomplete.
+def checkShape(forest, params):
+    depth = int(forest.level.max()) + 1
+    if depth != params["depth"]:
+        raise RuntimeError("Trees have depth %i instead of %i." % (depth, params["depth"]))
+    complete = np.arange(len(forest)) < forest.roots()[-1]
+    nested = forest.parent >= 0
+    children = np.bincount(forest.parent[nested], minlength=len(forest))
+    inner = complete & (forest.level < depth - 1)
+    if np.any(children[inner] != params["fanout"]):
+        raise RuntimeError(
+            "Calls have between %i and %i children instead of %i."
+            % (children[inner].min(), children[inner].max(), params["fanout"])
+        )
+    deep = forest.level >= 2
+    if np.any(forest.thread_id[deep] != forest.thread_id[forest.parent[deep]]):
+        raise RuntimeError("Calls are nested into calls running on another thread.")
+
+
+# Best time of repeat runs of a function, in seconds. As in timeit, the
+# garbage collector is disabled while timing.
+def bestTime(func, repeat=1):
+    times = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(times)
+
+
+# Fixed workload, mixing Python and NumPy code like the stages of the
+# profiler. Stage times are divided by its time to be compared across machines.
+def calibration():
+    rng = random.Random(0)
+    values = sorted(rng.random() for _ in range(200000))
+    ",".join("%f" % value for value in values)
+    np.sort(np.array(values)[::-1])
+
+
+# Time (best of repeat runs, relative to the calibration) and peak memory (in
+# MB) of each stage. The memory is measured in a separate run, since tracing
+# allocations slows down the code.
+def runCase(name, repeat=1):
+    params = CASES[name]
+    res = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        infile = os.path.join(workdir, "algotimeregister.out")
+        logfile = os.path.join(workdir, "mantidprofile.txt")
+        generate.writeAlgorithmLog(
+            infile, spans=params["spans"], depth=params["depth"], fanout=params["fanout"], nthreads=params["threads"]
+        )
+        generate.writeCpuLog(logfile, samples=params["samples"], nthreads=params["threads"])
+
+        state, stages = pipeline(infile, logfile, workdir)
+        for stage, func in stages.items():
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            # The calibration is timed next to each stage, since the speed of
+            # the machine can change during the run
+            reference = bestTime(calibration, repeat)
+            seconds = bestTime(func, repeat)
+            res[stage] = {"relative_time": seconds / reference, "peak_memory": peak / 1024.0**2}
+            print(
+                "  %-14s %10.4fs %10.4fx %10.1fMB"
+                % (stage, seconds, res[stage]["relative_time"], res[stage]["peak_memory"])
+            )
+            if stage == "toTrees":
+                checkShape(state["forest"], params)
+    return res
+
+
+# List of the stages which are slower or use more memory than the baseline,
+# by more than the tolerance (relative). Very short or small measurements are
+# too noisy to be compared. Times are relative to the calibration workload, so
+# that baselines measured on another machine can be used.
+def compare(results, baselines, tolerance):
+    regressions = []
+    for name, stages in results.items():
+        if name not in baselines:
+            continue
+        for stage, res in stages.items():
+            ref = baselines[name].get(stage)
+            if ref is None:
+                continue
+            for key, minimum in [("relative_time", 0.25), ("peak_memory", 1.0)]:
+                if max(res[key], ref[key]) < minimum:
+                    continue
+                ratio = res[key] / max(ref[key], 1.0e-9)
+                if ratio > 1.0 + tolerance:
+                    regressions.append("%s/%s %s: %.4g -> %.4g (x%.2f)" % (name, stage, key, ref[key], res[key], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Mantid profiler pipeline")
+
+    parser.add_argument(
+        "--cases", type=str, nargs="+", default=["small", "medium"], choices=list(CASES), help="sizes to run"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs of each stage")
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=os.path.join(HERE, "baselines.json"),
+        help="name of the file containing the baseline results",
+    )
+    parser.add_argument("--update", action="store_true", help="store the results as the new baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.5, help="allowed relative increase in time or memory over the baseline"
+    )
+
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.cases:
+        print("%s: %s" % (name, CASES[name]))
+        results[name] = runCase(name, repeat=args.repeat)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as inp:
+            baselines = json.load(inp)
+
+    if args.update:
+        baselines.update(results)
+        with open(args.baseline, "w") as out:
+            json.dump(baselines, out, indent=2, sort_keys=True)
+            out.write("\n")
+        print("Baseline written to " + args.baseline)
+        return 0
+
+    regressions = compare(results, baselines, args.tolerance)
+    if regressions:
+        print("Regressions over the baseline:")
+        for line in regressions:
+            print("  " + line)
+        return 1
+    print("No regressions over the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# Mantid algorithm profiler
+# Copyright (C) 2018 Neil Vaytet & Igor Gudich, European Spallation Source
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Export of the profile to the Chrome Trace Event format, which can be opened
+# in https://ui.perfetto.dev or chrome://tracing.
+# Specification:
+# https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+
+import gzip
+import json
+
+
+# Open the output file, compressing it if the name ends with .gz
+def openTraceFile(filename):
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "wt")
+    return open(filename, "w")
+
+
+# Write a single event, preceded by a separator if it is not the first one
+def writeEvent(traceFile, event, first):
+    if not first:
+        traceFile.write(",\n")
+    traceFile.write(json.dumps(event, separators=(",", ":")))
+
+
+# Stream the algorithm forest and the process monitor samples to a trace file.
+# Algorithms become complete events ("X") on the thread that ran them, while
+# CPU, RAM and thread counts become counter events ("C").
+# All timestamps are in microseconds, relative to the start of the monitor.
+def writeTrace(filename=None, x=None, data=None, forest=None, sync_time=0, header=None, pid=0):
+    # Offset (in microseconds) between the algorithm timings and the monitor
+    offset = 0.0
+    if len(forest) > 0:
+        offset = header / 1.0e3 - sync_time * 1.0e6
+
+    with openTraceFile(filename) as traceFile:
+        traceFile.write('{"displayTimeUnit":"ms","traceEvents":[\n')
+        writeEvent(traceFile, {"ph": "M", "name": "process_name", "pid": pid, "args": {"name": "Mantid"}}, True)
+
+        threads = set()
+        names = forest.names
+        for name, start, finish, counter, tid in zip(
+            forest.name_id.tolist(),
+            forest.start.tolist(),
+            forest.finish.tolist(),
+            forest.counter.tolist(),
+            forest.thread_id.tolist(),
+        ):
+            if tid not in threads:
+                threads.add(tid)
+                writeEvent(
+                    traceFile,
+                    {"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": "Thread %i" % tid}},
+                    False,
+                )
+            writeEvent(
+                traceFile,
+                {
+                    "ph": "X",
+                    "name": names[name],
+                    "cat": "algorithm",
+                    "pid": pid,
+                    "tid": tid,
+                    "ts": start / 1.0e3 + offset,
+                    "dur": (finish - start) / 1.0e3,
+                    "args": {"call": counter},
+                },
+                False,
+            )
+
+        for i in range(len(x)):
+            ts = x[i] * 1.0e6
+            writeEvent(
+                traceFile, {"ph": "C", "name": "CPU (%)", "pid": pid, "ts": ts, "args": {"CPU": data[i, 1]}}, False
+            )
+            writeEvent(
+                traceFile,
+                {"ph": "C", "name": "RAM (GB)", "pid": pid, "ts": ts, "args": {"RAM": data[i, 2] / 1000.0}},
+                False,
+            )
+            writeEvent(
+                traceFile,
+                {
+                    "ph": "C",
+                    "name": "Threads",
+                    "pid": pid,
+                    "ts": ts,
+                    "args": {"active": int(data[i, 4]), "total": int(data[i, 5])},
+                },
+                False,
+            )
+
+        traceFile.write("\n]}\n")
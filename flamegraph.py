@@ -0,0 +1,98 @@
+# Mantid algorithm profiler
+# Copyright (C) 2018 Neil Vaytet & Igor Gudich, European Spallation Source
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Flame graph of the algorithm calls: all the calls with the same stack of
+# algorithm names are merged together, so that the size of the output depends
+# on the number of unique stacks, not on the number of calls.
+
+import json
+
+import numpy as np
+
+
+# Merge the nodes of a forest with identical name paths.
+# Returns a dict with, for each unique path: its algorithm name, the index of
+# the parent path (-1 for top-level algorithms), the number of calls, and the
+# total and self times (in nanoseconds).
+def foldStacks(forest):
+    n = len(forest)
+    paths = {}
+    names = []
+    parents = []
+    path = np.zeros(n, dtype=np.int64)
+    # Nodes are stored in depth-first order, so parents come before children
+    for i in range(n):
+        p = forest.parent[i]
+        key = (path[p] if p >= 0 else -1, forest.name_id[i])
+        if key not in paths:
+            paths[key] = len(names)
+            names.append(forest.names[key[1]])
+            parents.append(key[0])
+        path[i] = paths[key]
+
+    duration = forest.finish - forest.start
+    self_time = forest.self_time()
+
+    npaths = len(names)
+    return {
+        "names": names,
+        "parents": np.array(parents, dtype=np.int64),
+        "calls": np.bincount(path, minlength=npaths),
+        "total": np.bincount(path, weights=duration, minlength=npaths),
+        "self": np.bincount(path, weights=self_time, minlength=npaths),
+    }
+
+
+# Full stack of algorithm names for each unique path
+def stackNames(stacks):
+    res = []
+    for name, parent in zip(stacks["names"], stacks["parents"]):
+        res.append(name if parent < 0 else res[parent] + ";" + name)
+    return res
+
+
+# Write the stacks in the collapsed format used by flamegraph.pl, speedscope
+# and similar tools. Values are self times in microseconds.
+def writeCollapsed(filename, stacks):
+    with open(filename, "w") as outFile:
+        for stack, value in zip(stackNames(stacks), stacks["self"]):
+            value = int(round(value / 1.0e3))
+            if value > 0:
+                outFile.write("%s %i\n" % (stack, value))
+
+
+# Generate the Plotly sunburst trace for the stacks
+def stacksToHtml(stacks, divName):
+    hovertext = []
+    for i, name in enumerate(stacks["names"]):
+        hovertext.append(
+            "%s<br>Total: %.3fs | Self: %.3fs | Calls: %i"
+            % (name, stacks["total"][i] / 1.0e9, stacks["self"][i] / 1.0e9, stacks["calls"][i])
+        )
+
+    outputString = "var flame = {\n"
+    outputString += "type: 'sunburst',\n"
+    outputString += "ids: %s,\n" % json.dumps(["p%i" % i for i in range(len(stacks["names"]))])
+    outputString += "labels: %s,\n" % json.dumps(stacks["names"])
+    outputString += "parents: %s,\n" % json.dumps(["p%i" % p if p >= 0 else "" for p in stacks["parents"]])
+    outputString += "values: %s,\n" % json.dumps([v / 1.0e9 for v in stacks["self"]])
+    outputString += "branchvalues: 'remainder',\n"
+    outputString += "hovertext: %s,\n" % json.dumps(hovertext)
+    outputString += "hoverinfo: 'text',\n"
+    outputString += "};\n"
+    outputString += "var flameLayout = {'height': 700, 'title': 'Aggregated algorithm stacks'};\n"
+    outputString += "Plotly.newPlot('%s', [flame], flameLayout);\n" % divName
+    return outputString
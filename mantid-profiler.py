@@ -22,6 +22,10 @@ import sys
 import numpy as np
 
 import algorithm_tree as at
+import chrome_trace
+import flamegraph
+import overhead
+import parallelism
 import psrecord
 
 
@@ -95,39 +99,42 @@ def stringToColor(string):
     return [red, grn, blu, (red + grn + blu) / 3.0]
 
 
-# Generate HTML output for a tree node
-def treeNodeToHtml(node, lmax, sync_time, header, count, tot_time):
-    x0 = ((node.info[1] + header) / 1.0e9) - sync_time
-    x1 = ((node.info[2] + header) / 1.0e9) - sync_time
+# Generate HTML output for node i of the forest
+def treeNodeToHtml(forest, i, lmax, sync_time, header, count, tot_time):
+    parent, level, _ = forest.structure()
+    info = forest.info(i)
+    children = [forest.info(j) for j in forest.children(i)]
+    x0 = ((info[1] + header) / 1.0e9) - sync_time
+    x1 = ((info[2] + header) / 1.0e9) - sync_time
     x2 = 0.5 * (x0 + x1)
     y0 = 0.0
-    y1 = -(lmax - node.level + 1)
+    y1 = -(lmax - level[i] + 1)
     dt = x1 - x0
 
     # Get unique color from algorithm name
-    color = stringToColor(node.info[0].split(" ")[0])
+    color = stringToColor(info[0].split(" ")[0])
     # Compute raw time and percentages
     rawTime = dt
-    if len(node.children) > 0:
-        for ch in node.children:
-            rawTime -= (ch.info[2] - ch.info[1]) / 1.0e9
+    if len(children) > 0:
+        for ch in children:
+            rawTime -= (ch[2] - ch[1]) / 1.0e9
     percTot = dt * 100.0 / tot_time
     percRaw = rawTime * 100.0 / tot_time
 
     # Create the text inside hover box
-    boxText = node.info[0] + " : "
+    boxText = info[0] + " : "
     if dt < 0.1:
         boxText += "%.1E" % dt
     else:
         boxText += "%.1f" % dt
     boxText += "s (%.1f%%) | %.1fs (%.1f%%)<br>" % (percTot, rawTime, percRaw)
 
-    if node.parent is not None:
-        boxText += "Parent: " + node.parent.info[0] + "<br>"
-    if len(node.children) > 0:
+    if parent[i] >= 0:
+        boxText += "Parent: " + forest.info(parent[i])[0] + "<br>"
+    if len(children) > 0:
         boxText += "Children: <br>"
-        for ch in node.children:
-            boxText += "  - " + ch.info[0] + "<br>"
+        for ch in children:
+            boxText += "  - " + ch[0] + "<br>"
 
     # Create trace
     base_url = "https://docs.mantidproject.org/nightly/algorithms/"
@@ -151,7 +158,7 @@ def treeNodeToHtml(node, lmax, sync_time, header, count, tot_time):
         textcolor = "#ffffff"
     outputString += (
         "text: ['', '', '<a style=\"text-decoration: none; color: %s;\" href=\"%s%s-v1.html\">%s</a>', '', ''],\n"
-        % (textcolor, base_url, node.info[0].split()[0], node.info[0])
+        % (textcolor, base_url, info[0].split()[0], info[0])
     )
     outputString += "textposition: 'top',\n"
     outputString += "hovertext: '" + boxText + "',\n"
@@ -167,7 +174,18 @@ def treeNodeToHtml(node, lmax, sync_time, header, count, tot_time):
 
 # Generate HTML interactive plot with Plotly library
 def htmlProfile(
-    filename=None, x=None, data=None, records=None, fill_factor=0, nthreads=0, lmax=0, sync_time=0, header=None
+    filename=None,
+    x=None,
+    data=None,
+    forest=None,
+    fill_factor=0,
+    nthreads=0,
+    lmax=0,
+    sync_time=0,
+    header=None,
+    parallel=None,
+    stacks=None,
+    profiler=None,
 ):
     htmlFile = open(filename, "w")
     htmlFile.write("<head>\n")
@@ -175,6 +193,8 @@ def htmlProfile(
     htmlFile.write("</head>\n")
     htmlFile.write("<body>\n")
     htmlFile.write('  <div id="myDiv"></div>\n')
+    if stacks is not None:
+        htmlFile.write('  <div id="flameDiv"></div>\n')
     htmlFile.write("  <script>\n")
     # CPU
     htmlFile.write("  var trace1 = {\n")
@@ -224,11 +244,33 @@ def htmlProfile(
 
     count = 4
     dataString = "[trace1,trace2,trace3"
-    for tree in at.toTrees(records):
-        for node in tree.to_list():
-            htmlFile.write(treeNodeToHtml(node, lmax, sync_time, header, count, x[-1]))
-            dataString += ",trace%i" % count
-            count += 1
+    summary = "Fill factor: %.1f%%" % fill_factor
+    # Algorithm concurrency
+    if parallel is not None:
+        htmlFile.write("  var trace%i = {\n" % count)
+        htmlFile.write("    x: [\n")
+        for t in parallel["times"]:
+            htmlFile.write("%f,\n" % (((t + header) / 1.0e9) - sync_time))
+        htmlFile.write("],\n")
+        htmlFile.write("    y: [\n")
+        for c in parallel["concurrency"]:
+            htmlFile.write("%f,\n" % (c * 100.0))
+        htmlFile.write("],\n")
+        htmlFile.write("  xaxis: 'x',\n")
+        htmlFile.write("  yaxis: 'y1',\n")
+        htmlFile.write("  type: 'scatter',\n")
+        htmlFile.write("  line: {shape: 'hv'},\n")
+        htmlFile.write("  name:'Algorithm concurrency',\n")
+        htmlFile.write("};\n")
+        dataString += ",trace%i" % count
+        count += 1
+        summary += " | " + parallelism.summary(parallel)
+
+    # The nodes of the forest are stored in depth-first order
+    for i in range(len(forest)):
+        htmlFile.write(treeNodeToHtml(forest, i, lmax, sync_time, header, count, x[-1]))
+        dataString += ",trace%i" % count
+        count += 1
     dataString += "]"
 
     htmlFile.write("var data = " + dataString + ";\n")
@@ -275,7 +317,7 @@ def htmlProfile(
     htmlFile.write("    xanchor: 'right',\n")
     htmlFile.write("    y: 1.1,\n")
     htmlFile.write("    yanchor: 'bottom',\n")
-    htmlFile.write("    text: 'Fill factor: %.1f%%',\n" % fill_factor)
+    htmlFile.write("    text: '%s',\n" % summary)
     htmlFile.write("    showarrow: false\n")
     htmlFile.write("  }],\n")
     htmlFile.write("  'shapes': [{\n")
@@ -293,7 +335,14 @@ def htmlProfile(
     htmlFile.write("    }],\n")
     htmlFile.write("};\n")
     htmlFile.write("Plotly.newPlot('myDiv', data, layout, {scrollZoom: true});\n")
-    htmlFile.write("</script>\n</body>\n</html>\n")
+    # Aggregated flame graph
+    if stacks is not None:
+        htmlFile.write(flamegraph.stacksToHtml(stacks, "flameDiv"))
+    htmlFile.write("</script>\n")
+    # Cost of the profiler itself
+    if profiler is not None:
+        htmlFile.write(profiler.toHtml())
+    htmlFile.write("</body>\n</html>\n")
     htmlFile.close()
 
 
@@ -328,25 +377,44 @@ def main():
         help="minimum duration for an algorithm to appear in" "the profiling graph (in seconds).",
     )
 
+    parser.add_argument(
+        "--tracefile",
+        type=str,
+        help="name of output Chrome Trace Event file, for use with Perfetto "
+        "or chrome://tracing (gzipped if the name ends with .gz).",
+    )
+
+    parser.add_argument(
+        "--flamefile",
+        type=str,
+        help="name of output file containing the aggregated algorithm stacks, "
+        "in the collapsed format used by flame graph tools.",
+    )
+
     args = parser.parse_args()
 
+    # Measure the cost of the profiler itself
+    profiler = overhead.Overhead()
+
     # Launch the process monitor and wait for it to return
     print("Attaching to process " + args.pid)
-    psrecord.monitor(int(args.pid), logfile=args.logfile, interval=args.interval)
+    with profiler.stage("monitor"):
+        sampler = psrecord.monitor(int(args.pid), logfile=args.logfile, interval=args.interval)
+    profiler.setSampler(sampler)
 
     # Read in algorithm timing log and build tree
     try:
-        header, records = at.fromFile(args.infile)
-        records = [x for x in records if x["finish"] - x["start"] > (args.mintime * 1.0e9)]
+        with profiler.stage("fromFile"):
+            header, records = at.fromFile(args.infile)
+            records = [x for x in records if x["finish"] - x["start"] > (args.mintime * 1.0e9)]
         # Number of threads allocated to this run
         nthreads = int(header.split()[3])
         # Run start time
         header = int(header.split()[1])
-        # Find maximum level in all trees
-        lmax = 0
-        for tree in at.toTrees(records):
-            for node in tree.to_list():
-                lmax = max(node.level, lmax)
+        # Build the trees and find the maximum level in all trees
+        with profiler.stage("toTrees"):
+            forest = at.toForest(records)
+        lmax = int(forest.level.max()) if len(forest) > 0 else 0
     except FileNotFoundError as e:
         print("failed to load file:", e.filename)
         print("creating plot without algorithm annotations")
@@ -356,11 +424,12 @@ def main():
         nthreads = psutil.cpu_count()
         lmax = 1
         header = ""
-        records = []
+        forest = at.toForest([])
 
     # Read in CPU and memory activity log
     try:
-        sync_time, data = parse_cpu_log(args.logfile)
+        with profiler.stage("parse_cpu_log"):
+            sync_time, data = parse_cpu_log(args.logfile)
     except FileNotFoundError:
         raise
 
@@ -371,18 +440,50 @@ def main():
     area_under_curve = np.trapz(data[:, 1], x=x)
     fill_factor = area_under_curve / ((x[-1] - x[0]) * nthreads)
 
+    # Critical path and parallelism of the algorithms
+    with profiler.stage("analysis"):
+        parallel = parallelism.analyse(forest)
+    print("Fill factor: %.1f%%" % fill_factor)
+    if parallel is not None:
+        print(parallelism.summary(parallel))
+
+    # Merge the calls with identical stacks of algorithms
+    with profiler.stage("foldStacks"):
+        stacks = flamegraph.foldStacks(forest) if len(forest) > 0 else None
+        if stacks is not None and args.flamefile is not None:
+            flamegraph.writeCollapsed(args.flamefile, stacks)
+
     # Create HTML output with Plotly
-    htmlProfile(
-        filename=args.outfile,
-        x=x,
-        data=data,
-        records=records,
-        fill_factor=fill_factor,
-        nthreads=nthreads,
-        lmax=lmax,
-        sync_time=sync_time,
-        header=header,
-    )
+    with profiler.stage("htmlProfile"):
+        htmlProfile(
+            filename=args.outfile,
+            x=x,
+            data=data,
+            forest=forest,
+            fill_factor=fill_factor,
+            nthreads=nthreads,
+            lmax=lmax,
+            sync_time=sync_time,
+            header=header,
+            parallel=parallel,
+            stacks=stacks,
+            profiler=profiler,
+        )
+
+    # Export to the Chrome Trace Event format
+    if args.tracefile is not None:
+        with profiler.stage("writeTrace"):
+            chrome_trace.writeTrace(
+                filename=args.tracefile,
+                x=x,
+                data=data,
+                forest=forest,
+                sync_time=sync_time,
+                header=header,
+                pid=int(args.pid),
+            )
+
+    profiler.printSummary()
 
     return
 
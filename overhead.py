@@ -0,0 +1,88 @@
+# Mantid algorithm profiler
+# Copyright (C) 2018 Neil Vaytet & Igor Gudich, European Spallation Source
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Measure the cost of the profiler itself: the wall and CPU time spent in
+# each stage of the pipeline, and the CPU time and memory used by the sampler.
+
+import contextlib
+import time
+
+
+class Overhead:
+    def __init__(self):
+        # Each stage is [name, wall start, cpu start, wall time, cpu time],
+        # the times being None while the stage is running
+        self.stages = []
+        # Totals of the sampler measurements, as returned by psrecord.monitor:
+        # number of samples, elapsed time of the first and last samples, total
+        # and maximum CPU time per sample (s), and peak RSS (MB)
+        self.sampler = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        entry = [name, time.perf_counter(), time.process_time(), None, None]
+        self.stages.append(entry)
+        try:
+            yield
+        finally:
+            entry[3] = time.perf_counter() - entry[1]
+            entry[4] = time.process_time() - entry[2]
+
+    def setSampler(self, sampler):
+        self.sampler = sampler
+
+    # Lines of the summary. Stages which are still running are measured up to
+    # now, and marked with a star.
+    def lines(self):
+        res = ["Profiler stages:"]
+        for name, wall0, cpu0, wall, cpu in self.stages:
+            running = wall is None
+            if running:
+                wall = time.perf_counter() - wall0
+                cpu = time.process_time() - cpu0
+            res.append("  %-16s wall %9.3fs  cpu %9.3fs%s" % (name, wall, cpu, " *" if running else ""))
+
+        if self.sampler is not None and self.sampler["samples"] > 0:
+            nsamples = self.sampler["samples"]
+            cpu = self.sampler["cpu"]
+            duration = self.sampler["last"] - self.sampler["first"]
+            res.append("Sampler:")
+            res.append("  samples          %i" % nsamples)
+            if nsamples > 1:
+                res.append("  mean interval    %.3fms" % (duration * 1.0e3 / (nsamples - 1)))
+            res.append(
+                "  cpu per sample   %.3fms (max %.3fms)" % (cpu * 1.0e3 / nsamples, self.sampler["max_cpu"] * 1.0e3)
+            )
+            res.append("  total cpu        %.3fs" % cpu)
+            if duration > 0:
+                res.append("  cpu usage        %.2f%%" % (cpu * 100.0 / duration))
+            res.append("  peak RSS         %.1fMB" % self.sampler["max_rss"])
+        return res
+
+    def printSummary(self):
+        print("\n".join(self.lines()))
+
+    # Summary as an HTML block for the report
+    def toHtml(self):
+        outputString = '  <div id="overheadDiv">\n'
+        outputString += "  <h3>Profiler overhead</h3>\n"
+        outputString += "  <pre>\n"
+        outputString += "\n".join(self.lines()) + "\n"
+        outputString += "  </pre>\n"
+        if any(entry[3] is None for entry in self.stages):
+            outputString += "  <p>* still running when the report was written</p>\n"
+        outputString += "  </div>\n"
+        return outputString
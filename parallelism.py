@@ -0,0 +1,110 @@
+# Mantid algorithm profiler
+# Copyright (C) 2018 Neil Vaytet & Igor Gudich, European Spallation Source
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Critical path and parallelism analysis of the algorithm trees.
+# All times are in nanoseconds, relative to the start point of the timing log.
+
+import numpy as np
+
+
+# Number of threads running at least one algorithm, as a step function.
+# Returns the times of the steps and the concurrency from each step onwards.
+def concurrency(forest):
+    time = np.concatenate([forest.start, forest.finish])
+    step = np.concatenate([np.ones(len(forest), dtype=np.int64), -np.ones(len(forest), dtype=np.int64)])
+    tid = np.concatenate([forest.thread_id, forest.thread_id])
+
+    # Number of calls running on the thread after each event, processing the
+    # ends before the starts at equal times. The steps of each thread sum to
+    # zero, so the cumulative sum does not leak from one thread to the next.
+    order = np.lexsort((step, time, tid))
+    time = time[order]
+    step = step[order]
+    depth = np.cumsum(step)
+    # +1 when the thread becomes busy, -1 when it becomes idle
+    change = (depth > 0).astype(np.int64) - (depth - step > 0)
+
+    order = np.lexsort((change, time))
+    time = time[order]
+    busy = np.cumsum(change[order])
+    # Keep the last value at each time
+    last = np.append(time[1:] != time[:-1], True)
+    return time[last], busy[last]
+
+
+# Length of the longest path through the fork/join structure of the calls.
+# Calls made on the same thread run in sequence, while calls made on different
+# threads run concurrently, so that
+#   cp(node) = self time + max over threads of sum of cp(children on the thread)
+# where the self time is the part of the call not covered by its children.
+# The top-level calls are grouped by thread in the same way.
+def criticalPath(forest):
+    n = len(forest)
+    parent = forest.parent.tolist()
+    thread_id = forest.thread_id.tolist()
+    self_time = forest.self_time().tolist()
+    # Longest thread of the children of each node, the last entry being for
+    # the top-level calls
+    longest = [0] * (n + 1)
+    # Sum of the critical paths of the children of a node on a thread
+    totals = {}
+    # Nodes are stored in depth-first order, so all the children of a node
+    # are processed before it in reverse order
+    for i in reversed(range(n)):
+        length = self_time[i] + longest[i]
+        key = (parent[i], thread_id[i])
+        total = totals.get(key, 0) + length
+        totals[key] = total
+        if total > longest[parent[i]]:
+            longest[parent[i]] = total
+    return longest[-1]
+
+
+# Run the full analysis over a forest of algorithm calls
+def analyse(forest):
+    if len(forest) == 0:
+        return None
+
+    times, values = concurrency(forest)
+    length = criticalPath(forest)
+
+    durations = np.diff(times)
+    span = times[-1] - times[0]
+    if span > 0:
+        average = np.sum(values[:-1] * durations) / span
+        single = np.sum(durations[values[:-1] == 1]) / span
+    else:
+        average = 0.0
+        single = 0.0
+
+    return {
+        "times": times,
+        "concurrency": values,
+        "critical_path": length,
+        "span": int(span),
+        "average_parallelism": float(average),
+        "single_threaded": float(single),
+    }
+
+
+# One line summary of the analysis
+def summary(result):
+    return "Critical path: %.1fs (%.1f%%) | Parallelism: %.2f | Single-threaded: %.1f%%" % (
+        result["critical_path"] / 1.0e9,
+        result["critical_path"] * 100.0 / max(result["span"], 1),
+        result["average_parallelism"],
+        result["single_threaded"] * 100.0,
+    )
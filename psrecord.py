@@ -90,6 +90,10 @@ def monitor(pid, logfile=None, interval=None):
     import psutil
 
     pr = psutil.Process(pid)
+    # The profiler itself, to measure the cost of sampling. Only running
+    # totals are kept, so that long runs do not grow the memory of the sampler.
+    me = psutil.Process()
+    overhead = {"samples": 0, "first": 0.0, "last": 0.0, "cpu": 0.0, "max_cpu": 0.0, "max_rss": 0.0}
 
     # Record start time
     starting_point = time.time()
@@ -117,6 +121,8 @@ def monitor(pid, logfile=None, interval=None):
     try:
         # Start main event loop
         while True:
+            cpu_start = time.process_time()
+
             # Find current time
             try:
                 current_time = time.perf_counter()
@@ -168,6 +174,16 @@ def monitor(pid, logfile=None, interval=None):
             )
             f.flush()
 
+            # Record the CPU time and memory used by the sampler
+            sample_cpu = time.process_time() - cpu_start
+            if overhead["samples"] == 0:
+                overhead["first"] = current_time - start_time
+            overhead["samples"] += 1
+            overhead["last"] = current_time - start_time
+            overhead["cpu"] += sample_cpu
+            overhead["max_cpu"] = max(overhead["max_cpu"], sample_cpu)
+            overhead["max_rss"] = max(overhead["max_rss"], get_memory(me).rss / 1024.0**2)
+
             if interval is not None:
                 time.sleep(interval)
 
@@ -176,3 +192,5 @@ def monitor(pid, logfile=None, interval=None):
 
     if logfile:
         f.close()
+
+    return overhead